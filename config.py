@@ -33,12 +33,13 @@ DONATION_UUID = "179019d3-83dd-4619-b7d9-579786659204"
 
 # TTS缓存配置
 TTS_CACHE_SIZE = 200  # TTS缓存最大条目数量，设置为0禁用缓存
+TTS_DISK_CACHE_SIZE = 1000  # TTS磁盘缓存最大条目数量（tts_output/cache），设置为0禁用磁盘缓存
 
 # TTS节流配置
 TTS_THROTTLE_INTERVAL = 1.0  # TTS调用节流间隔（秒），防止弹幕过多时TTS服务器压力过大
 
 # 自定义话题列表配置
-CUSTOM_TOPICS = [
+CUSTOM_TOPICS = (
     "继续讲解产品如何使用",
     "讲解一下产品功能",
     "为什么要购买防噎仪",
@@ -48,5 +49,5 @@ CUSTOM_TOPICS = [
     "库存紧张了，6件套套装仅有18套，完了后就需要另外购买",
     "会划破喉咙吗",
     "会不会对内脏口腔有伤害"
-]
+)
 CUSTOM_TOPIC_ENABLED = True  # 是否启用自定义话题功能
@@ -5,11 +5,10 @@ TTS (Text-to-Speech) 模块
 提供文本转语音功能
 """
 
-from .aliyun import TTSProvider
-from .edge import TTSProvider as EdgeTTSProvider
+# 各TTS提供者依赖较重，在 create_instance 中按需导入
 
 
-__all__ = ['TTSProvider', 'create_instance']
+__all__ = ['create_instance']
 
 
 class TTSFactory:
@@ -28,11 +27,13 @@ class TTSFactory:
             TTS 实例对象
         """
         if tts_type == 'aliyun':
+            from .aliyun import TTSProvider
             return TTSProvider(config, delete_audio)
         # TODO: 添加其他 TTS 类型的支持
         # elif tts_type == 'doubao':
         #     return DoubaoTTSProvider(config, delete_audio)
         elif tts_type == 'edge':
+            from .edge import TTSProvider as EdgeTTSProvider
             return EdgeTTSProvider(config, delete_audio)
         else:
             raise ValueError(f"不支持的 TTS 类型: {tts_type}")
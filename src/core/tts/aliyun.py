@@ -3,6 +3,7 @@ import json
 import hmac
 import hashlib
 import base64
+import asyncio
 import requests
 import logging
 from datetime import datetime
@@ -163,7 +164,7 @@ class TTSProvider():
     async def text_to_speak(self, text, output_file):
         if self._is_token_expired():
             logger.warning("Token已过期，正在自动刷新...")
-            self._refresh_token()
+            await asyncio.to_thread(self._refresh_token)
         request_json = {
             "appkey": self.appkey,
             "token": self.token,
@@ -177,14 +178,15 @@ class TTSProvider():
         }
 
         # print(self.api_url, json.dumps(request_json, ensure_ascii=False))
+        # requests是阻塞调用，放到线程中执行，避免阻塞共享的事件循环
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header, timeout=10
+            resp = await asyncio.to_thread(
+                requests.post, self.api_url, json.dumps(request_json), headers=self.header, timeout=10
             )
             if resp.status_code == 401:  # Token过期特殊处理
-                self._refresh_token()
-                resp = requests.post(
-                    self.api_url, json.dumps(request_json), headers=self.header, timeout=10
+                await asyncio.to_thread(self._refresh_token)
+                resp = await asyncio.to_thread(
+                    requests.post, self.api_url, json.dumps(request_json), headers=self.header, timeout=10
                 )
             # 检查返回请求数据的mime类型是否是audio/***，是则保存到指定路径下；返回的是binary格式的
             if resp.headers["Content-Type"].startswith("audio/"):
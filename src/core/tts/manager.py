@@ -6,13 +6,41 @@ TTS管理器
 """
 
 import os
+import json
+import copy
+import mmap
+import asyncio
 import yaml
+import base64
+import struct
+import time
+import tempfile
+import hashlib
 import logging
+import threading
+import traceback
+from collections import OrderedDict
+from config import TTS_CACHE_SIZE, TTS_DISK_CACHE_SIZE
 from . import create_instance
 from src.core.utils.util import audio_bytes_to_data
 
 logger = logging.getLogger(__name__)
 
+# 优先使用libyaml的C解析器，未编译libyaml时回退到纯Python实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 按base64帧处理的二进制音频类型
+_BYTES_TYPES = (bytes, bytearray, memoryview)
+
+# 已解析的配置缓存 {config_path: (mtime_ns, config)}，每个路径只保留最新版本
+_CONFIG_CACHE = {}
+
+# 磁盘缓存中超过该时长（秒）仍没有对应元数据的音频文件和临时文件，视为写入失败的残留文件
+_DISK_CACHE_ORPHAN_AGE = 60
+
 
 class TTSManager:
     """TTS管理器"""
@@ -29,14 +57,30 @@ class TTSManager:
         self.tts_provider = None
         self.config = {}
         self.selected_tts_module = None
+        self._provider_config_digest = ""  # 提供者配置摘要，作为缓存键的一部分
+        # 音频结果LRU缓存：同一提供者/音色/格式下相同文本的合成结果完全一致
+        self._audio_cache = OrderedDict()
+        self._audio_cache_lock = threading.Lock()
+        # 磁盘缓存目录：保存原始opus帧，进程重启后无需重新合成
+        self._disk_cache_dir = os.path.join(output_dir, "cache")
+        if TTS_CACHE_SIZE > 0 and TTS_DISK_CACHE_SIZE > 0:
+            os.makedirs(self._disk_cache_dir, exist_ok=True)
         self._load_config()
         self._init_tts_provider()
     
     def _load_config(self):
         """加载配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.config = yaml.safe_load(f)
+            mtime_ns = os.stat(self.config_path).st_mtime_ns
+            cached = _CONFIG_CACHE.get(self.config_path)
+            if cached is None or cached[0] != mtime_ns:
+                # 内存映射文件交给解析器直接读取，避免先整体读入再解析
+                with open(self.config_path, 'rb') as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        cached = (mtime_ns, yaml.load(mm, Loader=_YamlLoader))
+                _CONFIG_CACHE[self.config_path] = cached
+            # 每个实例拿到独立的副本，修改配置不会影响其他实例和缓存
+            self.config = copy.deepcopy(cached[1])
         except Exception as e:
             logger.error(f"加载配置文件失败: {e}")
             self.config = {}
@@ -57,6 +101,12 @@ class TTSManager:
             # 确保输出目录存在
             os.makedirs(self.output_dir, exist_ok=True)
             
+            # 语速、音调、音量、采样率等合成参数都会影响音频，修改配置后旧的缓存不再命中
+            self._provider_config_digest = hashlib.blake2b(
+                json.dumps(tts_config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'),
+                digest_size=16,
+            ).hexdigest()
+            
             # 获取TTS类型
             tts_type = tts_config.get('type', 'aliyun')
             
@@ -76,11 +126,215 @@ class TTSManager:
             self.tts_provider = None
     
 
-    async def generate_tts_data(self, content):
+    def _cache_key(self, content):
+        """生成音频缓存键：(提供者, 提供者配置, 音色, 格式, 文本) 的blake2b摘要"""
+        raw = "|".join((
+            str(self.selected_tts_module),
+            self._provider_config_digest,
+            str(getattr(self.tts_provider, 'voice', '')),
+            str(getattr(self.tts_provider, 'audio_file_type', '')),
+            content,
+        ))
+        return hashlib.blake2b(raw.encode('utf-8')).digest()
+
+    def _cache_get(self, key):
+        """从音频缓存读取，命中时更新LRU顺序"""
+        with self._audio_cache_lock:
+            result = self._audio_cache.get(key)
+            if result is not None:
+                self._audio_cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key, result):
+        """写入音频缓存，超出 TTS_CACHE_SIZE 时淘汰最久未使用的条目"""
+        with self._audio_cache_lock:
+            self._audio_cache[key] = result
+            self._audio_cache.move_to_end(key)
+            while len(self._audio_cache) > TTS_CACHE_SIZE:
+                self._audio_cache.popitem(last=False)
+
+    def clear_cache(self):
+        """清空内存音频缓存和磁盘缓存"""
+        with self._audio_cache_lock:
+            self._audio_cache.clear()
+        self.clear_disk_cache()
+
+    def get_cache_stats(self):
+        """获取内存音频缓存和磁盘缓存的统计信息"""
+        with self._audio_cache_lock:
+            size = len(self._audio_cache)
+        try:
+            with os.scandir(self._disk_cache_dir) as it:
+                disk_size = sum(1 for entry in it if entry.name.endswith(".json"))
+        except OSError:
+            disk_size = 0
+        return {
+            'size': size,
+            'max_size': TTS_CACHE_SIZE,
+            'disk_size': disk_size,
+            'disk_max_size': TTS_DISK_CACHE_SIZE
+        }
+
+    def _disk_cache_paths(self, key):
+        """返回磁盘缓存的音频文件路径和元数据文件路径"""
+        name = key.hex()
+        return (os.path.join(self._disk_cache_dir, f"{name}.opus"),
+                os.path.join(self._disk_cache_dir, f"{name}.json"))
+
+    def _disk_cache_load(self, key):
+        """从磁盘缓存读取opus帧
+
+        Returns:
+            tuple: (opus帧列表, 时长)，未命中或文件不完整时返回None
+        """
+        audio_path, meta_path = self._disk_cache_paths(key)
+        try:
+            # 元数据文件在音频文件之后写入，早于音频文件说明条目未写完整
+            if os.path.getmtime(meta_path) < os.path.getmtime(audio_path):
+                return None
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(audio_path, 'rb') as f:
+                blob = f.read()
+        except (OSError, ValueError):
+            return None
+        # 元数据被改坏（不是字典或缺少时长）时视为未命中
+        if not isinstance(meta, dict) or not isinstance(meta.get('duration'), (int, float)):
+            return None
+
+        # 每帧格式：4字节小端长度 + 帧数据
+        frames = []
+        offset = 0
+        try:
+            while offset < len(blob):
+                (frame_len,) = struct.unpack_from('<I', blob, offset)
+                offset += 4
+                frames.append(blob[offset:offset + frame_len])
+                offset += frame_len
+        except struct.error:
+            return None
+        if offset != len(blob) or len(frames) != meta.get('frames', len(frames)):
+            return None
+        try:
+            # 刷新元数据修改时间，淘汰时按最近使用顺序保留
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return frames, meta['duration']
+
+    def _disk_cache_store(self, key, audio_datas, duration):
+        """将opus帧写入磁盘缓存，仅缓存bytes帧列表"""
+        if not isinstance(audio_datas, list) or not all(isinstance(frame, bytes) for frame in audio_datas):
+            return
+        audio_path, meta_path = self._disk_cache_paths(key)
+        blob = b"".join(struct.pack('<I', len(frame)) + frame for frame in audio_datas)
+        meta = {
+            'duration': duration,
+            'audio_size': sum(len(frame) for frame in audio_datas),
+            'frames': len(audio_datas),
+        }
+        try:
+            # 先写临时文件再替换，避免读到写了一半的缓存
+            self._disk_cache_write(audio_path, blob)
+            self._disk_cache_write(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"写入TTS磁盘缓存失败: {e}")
+            return
+        self._disk_cache_evict()
+
+    def _disk_cache_write(self, path, data):
+        """通过唯一的临时文件原子写入，多个线程同时写同一条目时互不干扰"""
+        fd, tmp_path = tempfile.mkstemp(dir=self._disk_cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _disk_cache_evict(self):
+        """磁盘缓存条目超过 TTS_DISK_CACHE_SIZE 时删除最久未使用的条目，并清理写入失败的残留文件"""
+        metas = []
+        others = []
+        try:
+            with os.scandir(self._disk_cache_dir) as it:
+                for entry in it:
+                    item = (entry.stat().st_mtime, entry.path)
+                    (metas if entry.name.endswith(".json") else others).append(item)
+        except OSError:
+            return
+
+        stale = []
+        # 残留文件：临时文件，或没有元数据的音频文件；只清理足够旧的，避免删掉正在写入的条目
+        meta_stems = {os.path.splitext(path)[0] for _, path in metas}
+        deadline = time.time() - _DISK_CACHE_ORPHAN_AGE
+        for mtime, path in others:
+            if mtime < deadline and (path.endswith(".tmp") or os.path.splitext(path)[0] not in meta_stems):
+                stale.append(path)
+
+        if len(metas) > TTS_DISK_CACHE_SIZE:
+            metas.sort()
+            for _, meta_path in metas[:len(metas) - TTS_DISK_CACHE_SIZE]:
+                stale.append(meta_path)
+                stale.append(os.path.splitext(meta_path)[0] + ".opus")
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear_disk_cache(self):
+        """删除磁盘缓存中的所有条目"""
+        try:
+            with os.scandir(self._disk_cache_dir) as it:
+                paths = [entry.path for entry in it if entry.is_file()]
+        except OSError:
+            return
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _serialize_audio_datas(self, audio_datas):
+        """将音频帧数据转换为JSON可序列化格式，bytes帧以base64字符串表示
+
+        Returns:
+            tuple: (serializable_audio_datas, audio_size)
+        """
+        # 整段bytes数据作为单个帧，同样返回base64帧列表；编码在C层完成，不经过Python整数对象
+        if isinstance(audio_datas, _BYTES_TYPES):
+            return [base64.b64encode(audio_datas).decode('ascii')], memoryview(audio_datas).nbytes
+
+        if isinstance(audio_datas, list):
+            serializable_audio_datas = [
+                base64.b64encode(frame).decode('ascii') if isinstance(frame, _BYTES_TYPES)
+                else frame if isinstance(frame, list)
+                else str(frame)
+                for frame in audio_datas
+            ]
+            audio_size = sum(
+                memoryview(frame).nbytes if isinstance(frame, _BYTES_TYPES)
+                else len(frame) if isinstance(frame, list)
+                else len(str(frame))
+                for frame in audio_datas
+            )
+            return serializable_audio_datas, audio_size
+
+        # 其他类型直接使用
+        return audio_datas, len(str(audio_datas))
+
+    async def generate_tts_data(self, content, validated=False):
         """生成TTS音频数据
 
         Args:
             content: 要转换的文本内容
+            validated: 内容是否已经过 filter_content_for_tts 校验，为True时跳过空值和长度检查
 
         Returns:
             tuple: (audio_datas, duration, audio_size) 音频数据列表、时长和大小，失败时返回(None, 0, 0)
@@ -89,110 +343,68 @@ class TTSManager:
             logger.warning("TTS提供者未初始化，跳过TTS数据生成")
             return None, 0, 0
 
-        if not content or not content.strip():
-            logger.debug("内容为空，跳过TTS数据生成")
-            return None, 0, 0
+        if not validated:
+            if not content or not content.strip():
+                logger.debug("内容为空，跳过TTS数据生成")
+                return None, 0, 0
 
-        # 清理内容
-        content = content.strip()
+            # 清理内容
+            content = content.strip()
 
-        # 过滤掉过短的内容
-        if len(content) < 2:
-            logger.debug(f"内容过短，跳过TTS数据生成: {content}")
-            return None, 0, 0
+            # 过滤掉过短的内容
+            if len(content) < 2:
+                logger.debug(f"内容过短，跳过TTS数据生成: {content}")
+                return None, 0, 0
+
+        cache_enabled = TTS_CACHE_SIZE > 0
+        disk_cache_enabled = cache_enabled and TTS_DISK_CACHE_SIZE > 0
+        if cache_enabled:
+            cache_key = self._cache_key(content)
+            cached_result = self._cache_get(cache_key)
+            if cached_result is not None:
+                logger.info("📦 TTS音频缓存命中: %s", content)
+                return cached_result
+
+            disk_result = await asyncio.to_thread(self._disk_cache_load, cache_key) if disk_cache_enabled else None
+            if disk_result is not None:
+                audio_datas, duration = disk_result
+                serializable_audio_datas, audio_size = self._serialize_audio_datas(audio_datas)
+                result = (serializable_audio_datas, duration, audio_size)
+                self._cache_put(cache_key, result)
+                logger.info("💽 TTS磁盘缓存命中: %s", content)
+                return result
 
         try:
             # 生成TTS音频字节数据
-            logger.info(f"开始生成TTS音频数据: {content}")
             audio_bytes = await self.tts_provider.text_to_speak(content, None)
-            logger.info(f"🔊 TTS提供者返回音频字节，大小: {len(audio_bytes) if audio_bytes else 0} 字节")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"🔊 TTS提供者返回音频字节，大小: {len(audio_bytes) if audio_bytes else 0} 字节")
 
             if audio_bytes and isinstance(audio_bytes, bytes):
                 # 获取音频文件格式
                 audio_format = getattr(self.tts_provider, 'audio_file_type', 'wav')
-                logger.info(f"🎵 开始处理音频字节数据，格式: {audio_format}")
-                
+
                 # 使用 audio_bytes_to_data 方法处理音频字节数据
-                logger.info(f"📊 调用 audio_bytes_to_data 处理音频数据...")
+                # 解码和opus编码是阻塞的CPU/子进程操作，放到线程中执行，不占用共享的事件循环
                 try:
-                    audio_datas, duration = audio_bytes_to_data(audio_bytes, audio_format, is_opus=True)
-                    logger.info(f"📊 audio_bytes_to_data 处理完成，duration: {duration}, audio_datas类型: {type(audio_datas)}")
+                    audio_datas, duration = await asyncio.to_thread(audio_bytes_to_data, audio_bytes, audio_format, is_opus=True)
                 except Exception as e:
                     logger.error(f"❌ audio_bytes_to_data 处理失败: {e}")
-                    import traceback
-                    logger.error(f"🔍 audio_bytes_to_data 异常堆栈: {traceback.format_exc()}")
+                    if logger.isEnabledFor(logging.ERROR):
+                        logger.error(f"🔍 audio_bytes_to_data 异常堆栈: {traceback.format_exc()}")
                     return None, 0, 0
                 
                 if audio_datas:
-                    logger.info(f"🔄 开始序列化音频数据，audio_datas类型: {type(audio_datas)}")
-                    # 计算音频数据大小并转换为JSON可序列化格式
-                    audio_size = 0
-                    serializable_audio_datas = []
-
-                    if isinstance(audio_datas, list):
-                        logger.info(f"📋 处理list类型音频数据，帧数: {len(audio_datas)}")
-                        for i, frame in enumerate(audio_datas):
-                            if isinstance(frame, bytes):
-                                frame_size = len(frame)
-                                audio_size += frame_size
-                                logger.debug(f"📦 处理字节帧 {i+1}, 大小: {frame_size} 字节")
-                                
-                                # 检查帧大小，避免序列化过大的数据
-                                if frame_size > 50000:  # 超过50KB的帧
-                                    logger.warning(f"⚠️ 字节帧 {i+1} 过大 ({frame_size} 字节)，跳过序列化避免内存问题")
-                                    # 对于过大的帧，存储一个标记而不是完整数据
-                                    serializable_audio_datas.append(f"<large_frame_{frame_size}_bytes>")
-                                else:
-                                    # 转换字节为整数列表以便JSON序列化
-                                    try:
-                                        serializable_audio_datas.append(list(frame))
-                                        logger.debug(f"✅ 字节帧 {i+1} 序列化完成")
-                                    except MemoryError:
-                                        logger.error(f"❌ 字节帧 {i+1} 序列化内存不足，使用占位符")
-                                        serializable_audio_datas.append(f"<memory_error_frame_{frame_size}_bytes>")
-                                    except Exception as e:
-                                        logger.error(f"❌ 字节帧 {i+1} 序列化异常: {e}")
-                                        serializable_audio_datas.append(f"<error_frame_{frame_size}_bytes>")
-                            elif isinstance(frame, list):
-                                audio_size += len(frame)
-                                serializable_audio_datas.append(frame)
-                                logger.debug(f"📝 处理列表帧 {i+1}, 大小: {len(frame)}")
-                            else:
-                                # 其他类型转换为字符串
-                                frame_str = str(frame)
-                                audio_size += len(frame_str)
-                                serializable_audio_datas.append(frame_str)
-                                logger.debug(f"🔤 处理其他类型帧 {i+1}, 类型: {type(frame)}")
-                    elif isinstance(audio_datas, bytes):
-                        audio_size = len(audio_datas)
-                        logger.info(f"📦 处理bytes类型音频数据，大小: {audio_size} 字节")
-                        
-                        # 检查bytes大小，避免序列化过大的数据
-                        if audio_size > 100000:  # 超过100KB的数据
-                            logger.warning(f"⚠️ bytes数据过大 ({audio_size} 字节)，使用占位符避免内存问题")
-                            serializable_audio_datas = f"<large_audio_data_{audio_size}_bytes>"
-                        else:
-                            logger.info(f"🔄 开始转换bytes为列表...")
-                            try:
-                                # 转换字节为整数列表
-                                serializable_audio_datas = list(audio_datas)
-                                logger.info(f"✅ bytes数据序列化完成，列表长度: {len(serializable_audio_datas)}")
-                            except MemoryError:
-                                logger.error(f"❌ bytes数据序列化内存不足，使用占位符")
-                                serializable_audio_datas = f"<memory_error_audio_data_{audio_size}_bytes>"
-                            except Exception as e:
-                                logger.error(f"❌ bytes数据序列化异常: {e}")
-                                serializable_audio_datas = f"<error_audio_data_{audio_size}_bytes>"
-                    else:
-                        logger.info(f"🔤 处理其他类型音频数据: {type(audio_datas)}")
-                        # 其他类型直接使用
-                        serializable_audio_datas = audio_datas
-                        audio_size = len(str(audio_datas))
-                    
-                    logger.info(f"🎯 音频数据序列化完成，总大小: {audio_size} 字节")
-
-                    logger.info(f"TTS音频数据生成成功，时长: {duration:.2f}秒，大小: {audio_size} 字节")
-                    return serializable_audio_datas, duration, audio_size
+                    if disk_cache_enabled:
+                        await asyncio.to_thread(self._disk_cache_store, cache_key, audio_datas, duration)
+                    serializable_audio_datas, audio_size = self._serialize_audio_datas(audio_datas)
+
+                    logger.info("TTS音频数据生成成功: %s, 时长: %.2f秒, 大小: %d 字节",
+                                content[:40], duration, audio_size)
+                    result = (serializable_audio_datas, duration, audio_size)
+                    if cache_enabled:
+                        self._cache_put(cache_key, result)
+                    return result
                 else:
                     logger.error(f"❌ 音频数据处理失败: {content}")
                     return None, 0, 0
@@ -207,8 +419,8 @@ class TTSManager:
 
         except Exception as e:
             logger.error(f"❌ 生成TTS音频数据异常: {e}")
-            import traceback
-            logger.error(f"🔍 TTS异常堆栈: {traceback.format_exc()}")
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(f"🔍 TTS异常堆栈: {traceback.format_exc()}")
             return None, 0, 0
     
     def is_available(self):
@@ -1,9 +1,13 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from waitress import serve
+import orjson
 import threading
 import time
 import random
 import asyncio
+import itertools
+from collections import deque
 from src.utils.common import GlobalVal, filter_content_for_tts
 from src.utils.logger import logger
 from src.core.tts.manager import get_tts_manager
@@ -15,24 +19,65 @@ CORS(app)  # 允许跨域访问
 # HTTP 服务器配置
 HTTP_SERVER_HOST = '0.0.0.0'
 HTTP_SERVER_PORT = 8080
+HTTP_SERVER_THREADS = 32  # waitress工作线程数，聊天接口可能等待TTS数秒，需要足够的线程
 
 # 自定义话题功能状态
-_last_returned_message = None  # 上次返回的消息
-_custom_topic_index = 0  # 当前话题索引
-_custom_topic_lock = threading.Lock()  # 线程锁
+_last_returned_key = None  # 上次返回消息的时间戳（只保留指纹，不持有音频数据）
+_topic_counter = itertools.count()  # 话题计数器，next() 在C层原子递增，无需加锁
+_last_served_topic_index = -1  # 最近一次返回的话题索引，仅用于状态查询；只做单次赋值，不做读-改-写
+
+# 话题列表是静态配置，启动时过滤一次即可，请求中不再重复过滤
+_N_TOPICS = len(CUSTOM_TOPICS)
+_FILTERED_TOPICS = tuple(filter_content_for_tts(topic) for topic in CUSTOM_TOPICS)
+
+# 预生成的自定义话题消息，由后台生产者线程在弹幕空闲时填充
+_prebaked = deque(maxlen=4)
+_PRODUCER_POLL_INTERVAL = 0.5  # 生产者轮询间隔（秒）
+PREWARM_CONCURRENCY = 4  # 启动预热时同时请求TTS服务的最大数量
+
+# 轮询接口“暂无数据”响应体，启动时序列化一次，每次请求直接复用
+_EMPTY_BODY = orjson.dumps({
+    'success': True,
+    'message': '暂无数据',
+    'data': None
+})
+_EMPTY_CHAT_BODY = orjson.dumps({
+    'success': True,
+    'message': '暂无数据',
+    'data': None,
+    'timestamp': None,
+    'tts_file': None,
+    'audio_datas': None,
+    'audio_duration': 0,
+    'audio_size': 0,
+    'tts_status': 'none',
+    'is_custom_topic': False
+})
+
+# 自定义话题响应体缓存 {(topic_index, tts_status): (audio_datas, 不含timestamp的JSON响应体)}
+# 同时保存生成响应体时的音频对象，音频重新生成后按对象身份判断失效
+_RESPONSE_CACHE = {}
+
+# 常驻后台事件循环：所有请求线程共用，避免每次请求都新建/销毁事件循环
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="http-async-loop", daemon=True).start()
+
+
+def run_async(coro):
+    """在常驻后台事件循环中执行协程并同步等待结果"""
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
 
 
 def generate_custom_topic_message():
     """生成自定义话题消息并处理TTS"""
-    global _custom_topic_index
-    
     if not CUSTOM_TOPIC_ENABLED or not CUSTOM_TOPICS:
         return None
     
-    with _custom_topic_lock:
-        # 循环选择话题
-        topic = CUSTOM_TOPICS[_custom_topic_index % len(CUSTOM_TOPICS)]
-        _custom_topic_index += 1
+    # 循环选择话题
+    idx = next(_topic_counter)
+    topic_index = idx % _N_TOPICS
+    topic = CUSTOM_TOPICS[topic_index]
+    filtered_content, is_valid = _FILTERED_TOPICS[topic_index]
     
     # 构造模拟的弹幕消息数据
     fake_message_data = {
@@ -44,8 +89,6 @@ def generate_custom_topic_message():
     }
     
     try:
-        # 对内容进行过滤处理
-        filtered_content, is_valid = filter_content_for_tts(topic)
         if not is_valid:
             logger.warning(f"自定义话题内容无效: {topic}")
             return None
@@ -54,11 +97,12 @@ def generate_custom_topic_message():
         
         # 同步生成TTS
         tts_manager = get_tts_manager()
-        audio_datas, audio_duration, audio_size = asyncio.run(tts_manager.generate_tts_data(filtered_content))
+        audio_datas, audio_duration, audio_size = run_async(tts_manager.generate_tts_data(filtered_content, validated=True))
         
         if audio_datas:
             # 构造包含TTS数据的完整消息
             message_with_tts = {
+                'topic_index': topic_index,
                 'timestamp': int(time.time() * 1000),
                 'data': fake_message_data,
                 'audio_datas': audio_datas,
@@ -77,6 +121,36 @@ def generate_custom_topic_message():
         return None
 
 
+def ojson(payload, status=200):
+    """使用orjson序列化响应，用于携带音频数据的大响应体"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
+def custom_topic_response(custom_message):
+    """构造自定义话题响应，音频数据的JSON序列化结果按话题缓存复用"""
+    key = (custom_message['topic_index'], custom_message['tts_status'])
+    cached = _RESPONSE_CACHE.get(key)
+    if cached is not None and cached[0] is custom_message['audio_datas']:
+        body = cached[1]
+    else:
+        payload = {
+            'success': True,
+            'message': '获取成功（自定义话题）',
+            'data': custom_message['data'],
+            'tts_file': None,
+            'audio_datas': custom_message['audio_datas'],
+            'audio_duration': custom_message['audio_duration'],
+            'audio_size': custom_message['audio_size'],
+            'tts_status': custom_message['tts_status'],
+            'is_custom_topic': True
+        }
+        body = orjson.dumps(payload)
+        _RESPONSE_CACHE[key] = (custom_message['audio_datas'], body)
+    # 时间戳每次都不同，拼接在缓存的响应体前面
+    body = b'{"timestamp":%d,' % custom_message['timestamp'] + body[1:]
+    return Response(body, status=200, mimetype='application/json')
+
+
 @app.route('/', methods=['GET'])
 def index():
     """API 主页"""
@@ -94,14 +168,15 @@ def index():
             '/api/tts/cache/clear': '清空TTS缓存',
             '/api/tts/throttle': '获取TTS节流状态信息',
             '/api/custom-topics/status': '获取自定义话题功能状态'
-        }
+        },
+        'audio_datas': 'opus帧列表，每一帧为base64编码的字符串，客户端需base64解码后再送入opus解码器'
     })
 
 
 @app.route('/api/messages/chat', methods=['GET'])
 def get_latest_chat_message():
     """获取最新的普通消息（弹幕）并生成TTS"""
-    global _last_returned_message
+    global _last_returned_key, _last_served_topic_index
     
     # 记录请求开始时间
     request_start_time = time.time()
@@ -111,61 +186,45 @@ def get_latest_chat_message():
         
         # 添加调试日志：显示当前消息状态
         if message:
-            content = message.get('data', {}).get('content', '')
-            timestamp = message.get('timestamp', 0)
+            content = (message.data or {}).get('content', '')
+            timestamp = message.timestamp
             print(f"🌐 API获取到消息 - 内容: {content}, 时间戳: {timestamp}")
         else:
             print(f"🌐 API获取到消息: None（没有可用消息）")
         
         # 检查是否与上次返回的消息相同（通过时间戳判断）
-        if message is not None and _last_returned_message is not None:
-            if message.get('timestamp') == _last_returned_message.get('timestamp'):
+        if message is not None and _last_returned_key is not None:
+            if message.timestamp == _last_returned_key:
                 logger.info(f"[/api/messages/chat] 检测到重复消息，尝试生成自定义话题")
                 
-                # 生成自定义话题消息
-                custom_message = generate_custom_topic_message()
+                # 优先使用后台预生成的话题消息，没有时再同步生成
+                try:
+                    custom_message = _prebaked.popleft()
+                    # 预生成的消息可能已放置较久，按实际返回时间重新打时间戳
+                    custom_message['timestamp'] = int(time.time() * 1000)
+                except IndexError:
+                    custom_message = generate_custom_topic_message()
                 if custom_message:
+                    _last_served_topic_index = custom_message['topic_index']
                     # 计算总耗时
                     total_duration = (time.time() - request_start_time) * 1000
                     logger.info(f"[/api/messages/chat] 自定义话题返回 - 总耗时: {total_duration:.2f}ms")
                     
-                    return jsonify({
-                        'success': True,
-                        'message': '获取成功（自定义话题）',
-                        'data': custom_message['data'],
-                        'timestamp': custom_message['timestamp'],
-                        'tts_file': None,
-                        'audio_datas': custom_message['audio_datas'],
-                        'audio_duration': custom_message['audio_duration'],
-                        'audio_size': custom_message['audio_size'],
-                        'tts_status': custom_message['tts_status'],
-                        'is_custom_topic': True
-                    }), 200
+                    return custom_topic_response(custom_message)
         
         if message is None:
             # 计算总耗时
             total_duration = (time.time() - request_start_time) * 1000  # 转换为毫秒
             logger.info(f"[/api/messages/chat] 请求完成 - 暂无数据，总耗时: {total_duration:.2f}ms")
             
-            return jsonify({
-                'success': True,
-                'message': '暂无数据',
-                'data': None,
-                'timestamp': None,
-                'tts_file': None,
-                'audio_datas': None,
-                'audio_duration': 0,
-                'audio_size': 0,
-                'tts_status': 'none',
-                'is_custom_topic': False
-            }), 200
+            return Response(_EMPTY_CHAT_BODY, status=200, mimetype='application/json')
 
         # 直接从消息中获取音频数据（已预生成）
-        message_data = message['data']
-        audio_datas = message.get('audio_datas')
-        audio_duration = message.get('audio_duration', 0)
-        audio_size = message.get('audio_size', 0)
-        tts_status = message.get('tts_status', 'unknown')
+        message_data = message.data
+        audio_datas = message.audio_datas
+        audio_duration = message.audio_duration
+        audio_size = message.audio_size
+        tts_status = message.tts_status
         
         # 记录返回的消息信息
         if message_data and 'content' in message_data:
@@ -174,30 +233,30 @@ def get_latest_chat_message():
                 logger.info(f"[/api/messages/chat] 返回弹幕消息 - 内容: '{content[:50]}{'...' if len(content) > 50 else ''}', TTS状态: {tts_status}, 音频时长: {audio_duration:.2f}s, 音频大小: {audio_size}字节")
 
         # 更新最后返回的消息记录
-        _last_returned_message = message
+        _last_returned_key = message.timestamp
         
         # 计算总耗时
         total_duration = (time.time() - request_start_time) * 1000  # 转换为毫秒
         logger.info(f"[/api/messages/chat] 请求完成 - 总耗时: {total_duration:.2f}ms")
 
-        return jsonify({
+        return ojson({
             'success': True,
             'message': '获取成功',
             'data': message_data,
-            'timestamp': message['timestamp'],
+            'timestamp': message.timestamp,
             'tts_file': None,
             'audio_datas': audio_datas,
             'audio_duration': audio_duration,
             'audio_size': audio_size,
             'tts_status': tts_status,
             'is_custom_topic': False
-        }), 200
+        })
     except Exception as e:
         # 计算总耗时（异常情况）
         total_duration = (time.time() - request_start_time) * 1000  # 转换为毫秒
         logger.error(f"[/api/messages/chat] 请求失败 - 错误: {e}, 总耗时: {total_duration:.2f}ms")
         
-        return jsonify({
+        return ojson({
             'success': False,
             'message': f'服务器错误: {str(e)}',
             'data': None,
@@ -208,7 +267,7 @@ def get_latest_chat_message():
             'audio_size': 0,
             'tts_status': 'unknown',
             'is_custom_topic': False
-        }), 500
+        }, 500)
 
 
 @app.route('/api/messages/gift', methods=['GET'])
@@ -217,11 +276,7 @@ def get_latest_gift_message():
     try:
         message = GlobalVal.get_latest_gift_message()
         if message is None:
-            return jsonify({
-                'success': True,
-                'message': '暂无数据',
-                'data': None
-            }), 200
+            return Response(_EMPTY_BODY, status=200, mimetype='application/json')
         
         return jsonify({
             'success': True,
@@ -243,11 +298,7 @@ def get_latest_like_message():
     try:
         message = GlobalVal.get_latest_like_message()
         if message is None:
-            return jsonify({
-                'success': True,
-                'message': '暂无数据',
-                'data': None
-            }), 200
+            return Response(_EMPTY_BODY, status=200, mimetype='application/json')
         
         return jsonify({
             'success': True,
@@ -269,11 +320,7 @@ def get_latest_member_message():
     try:
         message = GlobalVal.get_latest_member_message()
         if message is None:
-            return jsonify({
-                'success': True,
-                'message': '暂无数据',
-                'data': None
-            }), 200
+            return Response(_EMPTY_BODY, status=200, mimetype='application/json')
         
         return jsonify({
             'success': True,
@@ -341,6 +388,8 @@ def get_tts_cache_stats():
     try:
         from src.utils.common import _tts_cache
         stats = _tts_cache.get_stats()
+        # TTS管理器内部的音频缓存（内存+磁盘）
+        stats['manager_cache'] = get_tts_manager().get_cache_stats()
         return jsonify({
             'success': True,
             'message': '获取成功',
@@ -361,6 +410,10 @@ def clear_tts_cache():
     try:
         from src.utils.common import _tts_cache
         _tts_cache.clear()
+        get_tts_manager().clear_cache()
+        # 丢弃基于旧音频的话题响应体和预生成消息
+        _RESPONSE_CACHE.clear()
+        _prebaked.clear()
         logger.info("TTS缓存已清空")
         return jsonify({
             'success': True,
@@ -418,17 +471,20 @@ def get_async_tts_status():
 def get_custom_topics_status():
     """获取自定义话题功能状态"""
     try:
-        global _custom_topic_index, _last_returned_message
-        
-        with _custom_topic_lock:
-            current_index = _custom_topic_index
+        # 按实际返回给客户端的话题计算，而不是话题计数器（生产者会提前预生成）
+        current_index = _last_served_topic_index + 1
+        try:
+            # 有预生成的消息时，下一个返回的就是队首的话题
+            next_index = _prebaked[0]['topic_index']
+        except IndexError:
+            next_index = current_index
         
         status_info = {
             'enabled': CUSTOM_TOPIC_ENABLED,
-            'topics_count': len(CUSTOM_TOPICS),
+            'topics_count': _N_TOPICS,
             'current_index': current_index,
-            'next_topic': CUSTOM_TOPICS[current_index % len(CUSTOM_TOPICS)] if CUSTOM_TOPICS else None,
-            'has_last_message': _last_returned_message is not None,
+            'next_topic': CUSTOM_TOPICS[next_index % _N_TOPICS] if CUSTOM_TOPICS else None,
+            'has_last_message': _last_returned_key is not None,
             'topics_list': CUSTOM_TOPICS
         }
         
@@ -451,18 +507,82 @@ def start_http_server():
     try:
         logger.info(f"HTTP API 服务器启动中，地址: http://{HTTP_SERVER_HOST}:{HTTP_SERVER_PORT}")
         print(f"HTTP API 服务器启动中，地址: http://{HTTP_SERVER_HOST}:{HTTP_SERVER_PORT}")
-        app.run(host=HTTP_SERVER_HOST, port=HTTP_SERVER_PORT, debug=False, threaded=True)
+        serve(app, host=HTTP_SERVER_HOST, port=HTTP_SERVER_PORT,
+              threads=HTTP_SERVER_THREADS, channel_timeout=60)
     except Exception as e:
         logger.error(f"HTTP 服务器启动失败: {e}")
         print(f"HTTP 服务器启动失败: {e}")
 
 
+def prewarm_custom_topics():
+    """并发预先生成所有自定义话题的TTS，填充TTS缓存"""
+    if not CUSTOM_TOPIC_ENABLED or not CUSTOM_TOPICS:
+        return
+
+    tts_manager = get_tts_manager()
+
+    async def warm_all():
+        # 信号量限制并发数，代替逐条节流等待
+        sem = asyncio.Semaphore(PREWARM_CONCURRENCY)
+
+        async def warm(topic, filtered_content):
+            async with sem:
+                try:
+                    await tts_manager.generate_tts_data(filtered_content, validated=True)
+                except Exception as e:
+                    logger.error(f"自定义话题TTS预热失败: {topic}, 错误: {e}")
+
+        await asyncio.gather(*(
+            warm(topic, filtered_content)
+            for topic, (filtered_content, is_valid) in zip(CUSTOM_TOPICS, _FILTERED_TOPICS)
+            if is_valid
+        ))
+
+    # 预热在本线程自己的事件循环中执行，不占用请求和生产者线程共用的 _loop
+    asyncio.run(warm_all())
+    logger.info(f"自定义话题TTS预热完成，共 {len(CUSTOM_TOPICS)} 个话题")
+
+
+def custom_topic_producer():
+    """后台生产者：弹幕空闲时预生成自定义话题消息，使请求处理不必等待TTS"""
+    if not CUSTOM_TOPIC_ENABLED or not CUSTOM_TOPICS:
+        return
+
+    last_seen = None
+    while True:
+        time.sleep(_PRODUCER_POLL_INTERVAL)
+        try:
+            message = GlobalVal.get_latest_chat_message()
+            timestamp = message.timestamp if message else None
+            if timestamp != last_seen:
+                # 有新弹幕，本轮不生成
+                last_seen = timestamp
+                continue
+            if len(_prebaked) < _prebaked.maxlen:
+                custom_message = generate_custom_topic_message()
+                if custom_message:
+                    _prebaked.append(custom_message)
+        except Exception as e:
+            logger.error(f"自定义话题生产者异常: {e}")
+
+
+def prewarm_then_produce():
+    """先预热所有自定义话题，再进入生产者循环"""
+    try:
+        prewarm_custom_topics()
+    except Exception as e:
+        logger.error(f"自定义话题TTS预热异常: {e}")
+    custom_topic_producer()
+
+
 def start_http_server_thread():
     """在新线程中启动 HTTP 服务器"""
     server_thread = threading.Thread(target=start_http_server, daemon=True)
     server_thread.start()
     logger.info("HTTP 服务器线程已启动")
     print("HTTP 服务器线程已启动")
+    # 后台预热自定义话题TTS，避免首次触发时阻塞请求；预热完成后再启动生产者，避免同一话题重复合成
+    threading.Thread(target=prewarm_then_produce, daemon=True).start()
     return server_thread
 
 
@@ -4,10 +4,13 @@ import threading
 import time
 import asyncio
 import hashlib
-from collections import OrderedDict
+import logging
+import functools
+from collections import OrderedDict, deque
 import concurrent.futures
 import queue
-import uuid
+import itertools
+from typing import NamedTuple
 from config import LIVE_WEB_SEND_URL, GAME_UUID, DONATION_UUID, TTS_CACHE_SIZE, TTS_THROTTLE_INTERVAL
 from src.core.tts.manager import init_tts_manager, get_tts_manager
 from src.core.utils.util import get_string_no_punctuation_or_emoji
@@ -18,12 +21,30 @@ from src.utils.logger import logger
 TTS_MAX_CONCURRENT = 3  # 最大并发TTS任务数量
 TTS_TASK_TIMEOUT = 10   # 单个TTS任务超时时间（秒）
 
+# 需要从弹幕中完全去除的标点符号，预先构建删除表，一次translate完成过滤
+_UNWANTED_PUNCTUATION = "''""\"'`~!@#$%^&*()_+={}[]|\\:;\"<>?/.,，。；：'"
+_PUNCT_TRANSTABLE = str.maketrans('', '', ''.join(set(_UNWANTED_PUNCTUATION)))
+# 数字删除表（含中文输入法常见的全角数字），用长度差统计数字个数
+_DIGIT_REMOVE = str.maketrans('', '', '0123456789０１２３４５６７８９')
+
+# 文本表情（如 [微笑]）和URL链接的匹配规则，模块加载时编译一次
+_BRACKET_RE = re.compile(r'\[[\u4e00-\u9fff\w]+\]')
+_URL_RE = re.compile(r'(?:https?://|www\.|\.(?:com|cn|net|org))', re.IGNORECASE)
+
+# 常见无意义词汇和告别语
+_MEANINGLESS_WORDS = frozenset({'呃', '额', '嗯', '啊', '哦', '诶', '哈', '嘿', '咦', '唉', '喔', 'uh', 'um', 'eh', 'ah', 'oh'})
+_FAREWELL_WORDS = ('晚安', '再见', '拜拜', '88')
+# 告别语合并为一个正则，一次扫描即可判断是否包含任意告别语
+_FAREWELL_RE = re.compile('|'.join(map(re.escape, _FAREWELL_WORDS)))
+
 
 
 def filter_content_for_tts(content):
     """
     对弹幕内容进行过滤，判断是否适合生成TTS
     
+    过滤结果只由内容决定，重复出现的弹幕直接返回缓存的结果（跳过日志也只在首次出现时输出）
+    
     Args:
         content: 原始弹幕内容
         
@@ -32,19 +53,40 @@ def filter_content_for_tts(content):
     """
     if not content or not isinstance(content, str):
         return "", False
+    return _filter_content_for_tts_cached(content)
+
+
+# 过滤结果单独用lru_cache缓存，不放进TTSCache，避免无效弹幕占用音频缓存的容量
+@functools.lru_cache(maxsize=1024)
+def _filter_content_for_tts_cached(content):
+    """filter_content_for_tts 的实际过滤逻辑，按内容缓存结果"""
+    # 0. 先做开销最小的检查，能直接拒绝的内容不再进入后续的规范化处理
+    stripped_content = content.strip()
+    if len(stripped_content) < 2:
+        logger.info(f"内容过短，跳过TTS: '{content}'")
+        return "", False
+    if stripped_content.isdigit():
+        logger.info(f"纯数字内容，跳过TTS: '{content}'")
+        return "", False
+    if stripped_content.lower() in _MEANINGLESS_WORDS:
+        logger.info(f"无意义词汇，跳过TTS: '{content}'")
+        return "", False
+    
+    # 检查是否包含告别语（告别语均为中文或数字，无需先转小写）
+    farewell_match = _FAREWELL_RE.search(content)
+    if farewell_match:
+        logger.info(f"包含告别语，跳过TTS: '{content}' -> 检测到: '{farewell_match.group()}'")
+        return "", False
     
     # 1. 首先调用util.py的方法去除首尾标点和表情
-    filtered_content = get_string_no_punctuation_or_emoji(content.strip())
+    filtered_content = get_string_no_punctuation_or_emoji(stripped_content)
     
     # 2. 去除文本表情符号（如 [微笑]、[哭]、[看] 等）
     # 使用正则表达式匹配方括号包围的内容
-    filtered_content = re.sub(r'\[[\u4e00-\u9fff\w]+\]', '', filtered_content)
+    filtered_content = _BRACKET_RE.sub('', filtered_content)
     
     # 3. 去除更多可能影响TTS的标点符号
-    # 定义需要完全去除的标点符号
-    unwanted_punctuation = "''""\"'`~!@#$%^&*()_+={}[]|\\:;\"<>?/.,，。；：'"
-    for punct in unwanted_punctuation:
-        filtered_content = filtered_content.replace(punct, '')
+    filtered_content = filtered_content.translate(_PUNCT_TRANSTABLE)
     
     # 去除多余的空格
     filtered_content = ' '.join(filtered_content.split())
@@ -67,48 +109,40 @@ def filter_content_for_tts(content):
     # 2.3 其他过滤规则
     
     # 检查是否为纯重复字符（超过4个相同字符）
-    if len(set(filtered_content)) == 1 and len(filtered_content) > 4:
+    if len(filtered_content) > 4 and filtered_content.count(filtered_content[0]) == len(filtered_content):
         logger.info(f"纯重复字符，跳过TTS: '{content}' -> '{filtered_content}'")
         return "", False
     
     # 检查是否为常见无意义词汇
-    meaningless_words = {'呃', '额', '嗯', '啊', '哦', '诶', '哈', '嘿', '咦', '唉', '喔', 'uh', 'um', 'eh', 'ah', 'oh'}
-    if filtered_content.lower() in meaningless_words:
+    if filtered_content.lower() in _MEANINGLESS_WORDS:
         logger.info(f"无意义词汇，跳过TTS: '{content}' -> '{filtered_content}'")
         return "", False
     
-    # 检查是否包含告别语
-    farewell_words = ['晚安', '再见', '拜拜', '88']
-    content_lower = content.lower()
-    for farewell in farewell_words:
-        if farewell in content_lower:
-            logger.info(f"包含告别语，跳过TTS: '{content}' -> 检测到: '{farewell}'")
-            return "", False
-    
     # 检查是否为URL链接
-    url_pattern = r'(https?://|www\.|\.com|\.cn|\.net|\.org)'
-    if re.search(url_pattern, filtered_content.lower()):
+    if _URL_RE.search(filtered_content):
         logger.info(f"包含URL链接，跳过TTS: '{content}' -> '{filtered_content}'")
         return "", False
     
     # 检查是否为纯英文字母重复（如"aaa", "bbb"）
     if len(filtered_content) >= 3 and filtered_content.isalpha():
-        if len(set(filtered_content.lower())) <= 2:  # 最多2种不同字母
+        # 去掉第一种字母后，剩余部分为空或只剩一种字母，即最多2种不同字母
+        lowered = filtered_content.lower()
+        rest = lowered.translate({ord(lowered[0]): None})
+        if not rest or rest.count(rest[0]) == len(rest):
             logger.info(f"简单字母重复，跳过TTS: '{content}' -> '{filtered_content}'")
             return "", False
     
     # 检查过长的重复模式（如"哈哈哈哈哈哈"）
-    if len(filtered_content) >= 6:
-        # 检查是否由某个短模式重复组成
-        for pattern_len in range(1, 4):  # 检查1-3字符的重复模式
-            if len(filtered_content) % pattern_len == 0:
-                pattern = filtered_content[:pattern_len]
-                if pattern * (len(filtered_content) // pattern_len) == filtered_content:
-                    logger.info(f"重复模式内容，跳过TTS: '{content}' -> '{filtered_content}' (模式: '{pattern}')")
-                    return "", False
+    n = len(filtered_content)
+    if n >= 6:
+        # 检查是否由某个短模式重复组成；单字符重复已由上面的纯重复字符检查覆盖
+        for pattern_len in (2, 3):
+            if n % pattern_len == 0 and filtered_content[:pattern_len] * (n // pattern_len) == filtered_content:
+                logger.info(f"重复模式内容，跳过TTS: '{content}' -> '{filtered_content}' (模式: '{filtered_content[:pattern_len]}')")
+                return "", False
     
     # 检查是否包含过多数字（超过50%是数字）
-    digit_count = sum(1 for c in filtered_content if c.isdigit())
+    digit_count = len(filtered_content) - len(filtered_content.translate(_DIGIT_REMOVE))
     if len(filtered_content) >= 4 and digit_count / len(filtered_content) > 0.5:
         logger.info(f"数字内容过多，跳过TTS: '{content}' -> '{filtered_content}'")
         return "", False
@@ -129,12 +163,12 @@ class TTSCache:
         self.cache = OrderedDict()  # 使用有序字典实现LRU缓存
         self._lock = threading.Lock()
     
-    def _generate_key(self, content):
-        """为文本内容生成缓存键"""
+    def make_key(self, content):
+        """为文本内容生成缓存键，调用方可预先计算并传给 get_by_key / put_by_key"""
         # 标准化文本内容：去除首尾空白并转小写
         normalized_content = content.strip().lower()
-        # 使用MD5生成固定长度的键
-        return hashlib.md5(normalized_content.encode('utf-8')).hexdigest()
+        # 使用8字节blake2b摘要作为键，比MD5十六进制字符串计算更快、占用更小
+        return hashlib.blake2b(normalized_content.encode('utf-8'), digest_size=8).digest()
     
     def get(self, content):
         """从缓存中获取TTS数据
@@ -145,14 +179,24 @@ class TTSCache:
         Returns:
             tuple: (audio_datas, audio_duration, audio_size) 如果存在，否则返回None
         """
-        key = self._generate_key(content)
-        with self._lock:
-            if key in self.cache:
-                # 移动到末尾（LRU更新）
-                cache_data = self.cache.pop(key)
-                self.cache[key] = cache_data
-                return cache_data['audio_datas'], cache_data['audio_duration'], cache_data['audio_size']
-        return None
+        return self.get_by_key(self.make_key(content))
+    
+    def get_by_key(self, key):
+        """使用预先计算的缓存键从缓存中获取TTS数据"""
+        # 读路径不加锁：CPython中单次字典读取是原子的
+        cache_data = self.cache.get(key)
+        if cache_data is None:
+            return None
+        # 只在更新LRU顺序时短暂加锁；锁被占用时跳过本次更新，接受顺序略有滞后
+        if self._lock.acquire(blocking=False):
+            try:
+                self.cache.move_to_end(key)
+            except KeyError:
+                # 条目已被并发淘汰
+                pass
+            finally:
+                self._lock.release()
+        return cache_data['audio_datas'], cache_data['audio_duration'], cache_data['audio_size']
     
     def put(self, content, audio_datas, audio_duration, audio_size):
         """将TTS数据存入缓存
@@ -162,25 +206,31 @@ class TTSCache:
             audio_datas: 音频数据
             audio_duration: 音频时长
             audio_size: 音频大小
+            
+        Returns:
+            tuple: (size, max_size) 写入后的缓存条目数量和最大容量
         """
-        key = self._generate_key(content)
+        return self.put_by_key(self.make_key(content), audio_datas, audio_duration, audio_size)
+    
+    def put_by_key(self, key, audio_datas, audio_duration, audio_size):
+        """使用预先计算的缓存键存入TTS数据，返回写入后的 (size, max_size)"""
         with self._lock:
-            # 如果已存在，先删除
-            if key in self.cache:
-                del self.cache[key]
-            
-            # 添加新缓存
+            # 添加新缓存（已存在时覆盖并移动到末尾）
             self.cache[key] = {
                 'audio_datas': audio_datas,
                 'audio_duration': audio_duration,
                 'audio_size': audio_size,
                 'cached_time': time.time()
             }
+            self.cache.move_to_end(key)
             
             # 检查缓存大小限制
             while len(self.cache) > self.max_size:
                 # 删除最旧的条目（LRU策略）
                 self.cache.popitem(last=False)
+            
+            # 在同一次加锁内返回缓存占用，调用方无需再调用 get_stats
+            return len(self.cache), self.max_size
     
     def clear(self):
         """清空缓存"""
@@ -201,15 +251,37 @@ class TTSCache:
 _tts_cache = TTSCache(max_size=TTS_CACHE_SIZE)
 
 
+class TTSResult(NamedTuple):
+    """聊天消息队列中的消息：固定字段的元组，比每条消息一个dict更省内存、创建更快"""
+    timestamp: int  # 毫秒时间戳
+    data: dict  # 原始消息数据
+    audio_datas: list = None
+    audio_duration: float = 0
+    audio_size: int = 0
+    tts_status: str = 'unknown'
+
+
 class AsyncTTSManager:
     """异步TTS任务管理器"""
     
     def __init__(self, max_concurrent=TTS_MAX_CONCURRENT):
         self.max_concurrent = max_concurrent
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent)
-        self.active_tasks = {}  # 活跃任务字典 {task_id: future}
-        self.pending_messages = {}  # 待处理的消息 {task_id: message_info}
+        # 有界任务队列：突发弹幕先排队，队列满时才拒绝新任务
+        self._queue = queue.Queue(maxsize=max_concurrent * 4)
+        self._active = 0  # 正在处理的任务数量
+        self._task_counter = itertools.count(1)  # 任务ID计数器，next() 在CPython中是原子操作
         self._lock = threading.Lock()
+        # 常驻事件循环线程：所有TTS协程都提交到这里执行，避免每个任务新建/销毁事件循环
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="tts-async-loop", daemon=True)
+        self._loop_thread.start()
+        # 常驻工作线程，从队列中取任务处理
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"tts-worker-{i}", daemon=True)
+            for i in range(max_concurrent)
+        ]
+        for worker in self._workers:
+            worker.start()
         
     def submit_tts_task(self, message_id, content, message_data, message_array):
         """提交TTS任务
@@ -221,47 +293,46 @@ class AsyncTTSManager:
             message_array: 目标消息数组
             
         Returns:
-            task_id: 任务ID，如果提交失败返回None
+            task_id: 整数任务ID，如果提交失败返回None
         """
-        task_id = str(uuid.uuid4())
+        task_id = next(self._task_counter)
         
-        with self._lock:
-            # 检查是否已经有足够多的任务在运行
-            if len(self.active_tasks) >= self.max_concurrent:
-                logger.warning(f"🚫 TTS任务队列已满({len(self.active_tasks)}/{self.max_concurrent})，跳过任务 - 内容: {content}")
-                return None
-            
-            # 存储任务信息
-            self.pending_messages[task_id] = {
-                'content': content,
-                'message_data': message_data,
-                'message_array': message_array,
-                'submit_time': time.time()
-            }
-            
-            # 提交异步任务
-            future = self.executor.submit(self._process_tts_task, task_id)
-            self.active_tasks[task_id] = future
-            
-            # 设置任务完成回调
-            future.add_done_callback(lambda f: self._task_completed(task_id, f))
+        try:
+            # 任务参数直接放入队列，由工作线程按位置取出，不另外保存任务表
+            self._queue.put_nowait((task_id, content, message_data, message_array))
+        except queue.Full:
+            logger.warning(f"🚫 TTS任务队列已满({self._queue.maxsize})，跳过任务 - 内容: {content}")
+            return None
             
-        logger.info(f"🚀 TTS任务已提交 - 任务ID: {task_id[:8]}, 内容: {content}, 活跃任务数: {len(self.active_tasks)}")
+        logger.info(f"🚀 TTS任务已提交 - 任务ID: {task_id}, 内容: {content}, 排队任务数: {self._queue.qsize()}")
         return task_id
     
-    def _process_tts_task(self, task_id):
+    def _worker(self):
+        """工作线程：循环从队列中取出任务处理，收到None时退出"""
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            task_id, content, message_data, message_array = task
+            with self._lock:
+                self._active += 1
+            result = None
+            try:
+                result = self._process_tts_task(task_id, content, message_data)
+                self._task_completed(task_id, content, message_array, result)
+            except Exception as e:
+                # 单个任务异常不能结束工作线程，否则工作线程会越来越少
+                logger.exception(f"💥 TTS工作线程处理任务异常 - 任务ID: {task_id}, 错误: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+            # 释放本次任务的引用，避免线程阻塞在下一次get()时仍持有上一条消息数据
+            del task, message_data, message_array, result
+    
+    def _process_tts_task(self, task_id, content, message_data):
         """处理单个TTS任务"""
         try:
-            task_info = self.pending_messages.get(task_id)
-            if not task_info:
-                logger.error(f"❌ 找不到任务信息: {task_id}")
-                return None
-                
-            content = task_info['content']
-            message_data = task_info['message_data']
-            message_array = task_info['message_array']
-            
-            logger.info(f"🧵 开始处理TTS任务 - 任务ID: {task_id[:8]}, 内容: {content}")
+            logger.info("🧵 开始处理TTS任务 - 任务ID: %s, 内容: %s", task_id, content)
             
             # 检查缓存
             cache_enabled = TTS_CACHE_SIZE > 0
@@ -270,57 +341,50 @@ class AsyncTTSManager:
             audio_size = 0
             
             if cache_enabled:
-                cached_result = _tts_cache.get(content)
+                # 缓存键只计算一次，查询和写入共用
+                cache_key = _tts_cache.make_key(content)
+                cached_result = _tts_cache.get_by_key(cache_key)
                 if cached_result:
                     audio_datas, audio_duration, audio_size = cached_result
-                    logger.info(f"📦 TTS缓存命中 - 任务ID: {task_id[:8]}, 内容: {content}")
+                    logger.info("📦 TTS缓存命中 - 任务ID: %s, 内容: %s", task_id, content)
                     return self._create_result(message_data, audio_datas, audio_duration, audio_size, 'cached')
             
             # 生成TTS
             if not audio_datas:
-                logger.info(f"🔊 开始生成TTS - 任务ID: {task_id[:8]}, 内容: {content}")
+                logger.info("🔊 开始生成TTS - 任务ID: %s, 内容: %s", task_id, content)
                 audio_datas, audio_duration, audio_size = self._generate_tts_with_timeout(content)
                 
                 if audio_datas and cache_enabled:
-                    _tts_cache.put(content, audio_datas, audio_duration, audio_size)
-                    cache_stats = _tts_cache.get_stats()
-                    logger.info(f"💾 TTS缓存已更新 - 任务ID: {task_id[:8]}, 缓存: {cache_stats['usage_rate']}")
+                    cache_size, cache_max = _tts_cache.put_by_key(cache_key, audio_datas, audio_duration, audio_size)
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(f"💾 TTS缓存已更新 - 任务ID: {task_id}, 缓存: {cache_size}/{cache_max} ({cache_size/cache_max*100:.1f}%)")
             
             if audio_datas:
-                logger.info(f"✅ TTS任务完成 - 任务ID: {task_id[:8]}, 内容: {content}, 时长: {audio_duration:.2f}s")
+                logger.info("✅ TTS任务完成 - 任务ID: %s, 内容: %s, 时长: %.2fs", task_id, content, audio_duration)
                 return self._create_result(message_data, audio_datas, audio_duration, audio_size, 'completed')
             else:
-                logger.warning(f"❌ TTS任务失败 - 任务ID: {task_id[:8]}, 内容: {content}")
+                logger.warning(f"❌ TTS任务失败 - 任务ID: {task_id}, 内容: {content}")
                 return None
                 
         except Exception as e:
-            logger.error(f"💥 TTS任务异常 - 任务ID: {task_id[:8]}, 错误: {e}")
-            import traceback
-            logger.error(f"🔍 异常堆栈: {traceback.format_exc()}")
+            # logger.exception 自动附带异常堆栈，由日志框架按需格式化
+            logger.exception(f"💥 TTS任务异常 - 任务ID: {task_id}, 错误: {e}")
             return None
     
     def _generate_tts_with_timeout(self, content):
         """带超时的TTS生成"""
+        future = None
         try:
             # 获取TTS管理器
             tts_manager = get_tts_manager()
             
-            # 在线程中运行异步代码
-            async def generate_async():
-                return await tts_manager.generate_tts_data(content)
-            
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                # 设置超时
-                return loop.run_until_complete(
-                    asyncio.wait_for(generate_async(), timeout=TTS_TASK_TIMEOUT)
-                )
-            finally:
-                loop.close()
+            # 提交到常驻事件循环，在当前工作线程中等待结果
+            future = asyncio.run_coroutine_threadsafe(tts_manager.generate_tts_data(content), self._loop)
+            return future.result(timeout=TTS_TASK_TIMEOUT)
                 
-        except asyncio.TimeoutError:
+        except concurrent.futures.TimeoutError:
+            # 超时后取消事件循环中仍在运行的协程
+            future.cancel()
             logger.warning(f"⏰ TTS生成超时({TTS_TASK_TIMEOUT}秒) - 内容: {content}")
             return None, 0, 0
         except Exception as e:
@@ -329,64 +393,45 @@ class AsyncTTSManager:
     
     def _create_result(self, message_data, audio_datas, audio_duration, audio_size, tts_status):
         """创建结果对象"""
-        return {
-            'timestamp': int(time.time() * 1000),
-            'data': message_data,
-            'audio_datas': audio_datas,
-            'audio_duration': audio_duration,
-            'audio_size': audio_size,
-            'tts_status': tts_status
-        }
+        return TTSResult(int(time.time() * 1000), message_data, audio_datas, audio_duration, audio_size, tts_status)
     
-    def _task_completed(self, task_id, future):
-        """任务完成回调"""
+    def _task_completed(self, task_id, content, message_array, result):
+        """任务完成处理：TTS成功时存储消息"""
         try:
-            result = future.result()
-            task_info = self.pending_messages.get(task_id)
-            
-            if task_info:
-                content = task_info['content']
-                message_array = task_info['message_array']
-                
-                if result and result.get('audio_datas'):
-                    # 只有TTS成功且有音频数据时才存储消息
-                    with GlobalVal._lock:
-                        message_array.insert(0, result)
-                        if len(message_array) > GlobalVal.MAX_MESSAGE_COUNT:
-                            message_array.pop()
-                        logger.info(f"📤 TTS成功，消息已存储 - 内容: {content}, 任务ID: {task_id[:8]}, 数组长度: {len(message_array)}")
-                else:
-                    # TTS失败或无音频数据，不存储消息
-                    logger.warning(f"❌ TTS失败或无音频数据，消息未存储 - 内容: {content}, 任务ID: {task_id[:8]}")
+            if result and result.audio_datas:
+                # 只有TTS成功且有音频数据时才存储消息
+                with GlobalVal._lock_for(message_array):
+                    message_array.appendleft(result)
+                    logger.info("📤 TTS成功，消息已存储 - 内容: %s, 任务ID: %s, 数组长度: %d", content, task_id, len(message_array))
+            else:
+                # TTS失败或无音频数据，不存储消息
+                logger.warning(f"❌ TTS失败或无音频数据，消息未存储 - 内容: {content}, 任务ID: {task_id}")
             
         except Exception as e:
-            logger.error(f"💥 任务完成处理异常 - 任务ID: {task_id[:8]}, 错误: {e}")
+            logger.error(f"💥 任务完成处理异常 - 任务ID: {task_id}, 错误: {e}")
             # 异常情况下不存储任何消息
-            task_info = self.pending_messages.get(task_id)
-            if task_info:
-                content = task_info.get('content', '')
-                logger.warning(f"💥 异常情况下，消息未存储 - 内容: {content}, 任务ID: {task_id[:8]}")
-        
-        finally:
-            # 清理任务记录
-            with self._lock:
-                self.active_tasks.pop(task_id, None)
-                self.pending_messages.pop(task_id, None)
-                logger.info(f"🧹 任务已清理 - 任务ID: {task_id[:8]}, 剩余活跃任务: {len(self.active_tasks)}")
+            logger.warning(f"💥 异常情况下，消息未存储 - 内容: {content}, 任务ID: {task_id}")
     
     def get_status(self):
         """获取任务管理器状态"""
         with self._lock:
-            return {
-                'max_concurrent': self.max_concurrent,
-                'active_tasks': len(self.active_tasks),
-                'pending_messages': len(self.pending_messages)
-            }
+            active_tasks = self._active
+        return {
+            'max_concurrent': self.max_concurrent,
+            'active_tasks': active_tasks,
+            'queued_tasks': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize
+        }
     
     def shutdown(self):
         """关闭任务管理器"""
         logger.info("🛑 正在关闭异步TTS管理器...")
-        self.executor.shutdown(wait=True)
+        # 每个工作线程一个退出信号，排在已有任务之后，保证队列中的任务处理完
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._loop.call_soon_threadsafe(self._loop.stop)
         logger.info("✅ 异步TTS管理器已关闭")
 
 
@@ -411,34 +456,47 @@ class GlobalVal(object):
     # 在线观众排名
     rank_user = []
     
-    # 消息存储数组，最多保留5条数据
-    chat_messages = []  # 普通消息（弹幕）数组
-    gift_messages = []  # 礼物消息数组
-    like_messages = []  # 点赞消息数组
-    member_messages = []  # 成员进入消息数组
-    
     # 最大消息保留数量
     MAX_MESSAGE_COUNT = 5
     
-    # 线程锁，保护共享数据
-    _lock = threading.Lock()
+    # 消息存储队列，最新消息在头部，超过最大数量时deque自动丢弃最旧的消息
+    chat_messages = deque(maxlen=MAX_MESSAGE_COUNT)  # 普通消息（弹幕）队列
+    gift_messages = deque(maxlen=MAX_MESSAGE_COUNT)  # 礼物消息队列
+    like_messages = deque(maxlen=MAX_MESSAGE_COUNT)  # 点赞消息队列
+    member_messages = deque(maxlen=MAX_MESSAGE_COUNT)  # 成员进入消息队列
+    
+    # 每个消息队列各自一把锁，不同类型消息的读写互不阻塞
+    _chat_lock = threading.Lock()  # 同时保护TTS节流状态
+    _gift_lock = threading.Lock()
+    _like_lock = threading.Lock()
+    _member_lock = threading.Lock()
     
     # TTS节流控制
+    # 聊天消息入库时不生成TTS（见 _add_chat_message），这里的节流状态不做强制，仅供 /api/tts/throttle 查询
     _last_tts_time = 0  # 上次TTS处理时间戳
     _tts_throttle_interval = TTS_THROTTLE_INTERVAL  # TTS节流间隔（秒）
     
     @classmethod
     def _add_message_to_array(cls, message_array, message_data):
-        """向消息数组头部添加新消息，保持最大长度为5"""
+        """向消息队列头部添加新消息，队列长度由deque的maxlen限制"""
         message_with_timestamp = {
             'timestamp': int(time.time() * 1000),  # 毫秒时间戳
             'data': message_data
         }
-        # 在数组头部插入新消息
-        message_array.insert(0, message_with_timestamp)
-        # 保持数组最大长度为5
-        if len(message_array) > cls.MAX_MESSAGE_COUNT:
-            message_array.pop()  # 移除最旧的消息
+        message_array.appendleft(message_with_timestamp)
+
+    @classmethod
+    def _lock_for(cls, message_array):
+        """返回保护指定消息队列的锁"""
+        if message_array is cls.chat_messages:
+            return cls._chat_lock
+        if message_array is cls.gift_messages:
+            return cls._gift_lock
+        if message_array is cls.like_messages:
+            return cls._like_lock
+        if message_array is cls.member_messages:
+            return cls._member_lock
+        raise ValueError("未知的消息队列")
 
     @classmethod
     def _add_chat_message(cls, message_array, message_data):
@@ -455,34 +513,29 @@ class GlobalVal(object):
             
         logger.info(f"✅ 内容验证通过 - 内容: {content}")
         
-        # 创建消息对象并存储
-        message_with_timestamp = {
-            'timestamp': int(time.time() * 1000),  # 毫秒时间戳
-            'data': message_data
-        }
+        # 创建消息对象并存储（尚无TTS音频，与TTS结果使用同一结构）
+        message_with_timestamp = TTSResult(int(time.time() * 1000), message_data)
         
-        with cls._lock:
-            message_array.insert(0, message_with_timestamp)
-            if len(message_array) > cls.MAX_MESSAGE_COUNT:
-                message_array.pop()
+        with cls._lock_for(message_array):
+            message_array.appendleft(message_with_timestamp)
             logger.info(f"💾 聊天消息已存储 - 内容: {content}, 数组长度: {len(message_array)}")
     
     @classmethod
     def update_gift_message(cls, message_data):
         """更新最新的礼物消息"""
-        with cls._lock:
+        with cls._gift_lock:
             cls._add_message_to_array(cls.gift_messages, message_data)
     
     @classmethod
     def update_like_message(cls, message_data):
         """更新最新的点赞消息"""
-        with cls._lock:
+        with cls._like_lock:
             cls._add_message_to_array(cls.like_messages, message_data)
     
     @classmethod
     def update_member_message(cls, message_data):
         """更新最新的成员进入消息"""
-        with cls._lock:
+        with cls._member_lock:
             cls._add_message_to_array(cls.member_messages, message_data)
     
     @classmethod
@@ -496,43 +549,44 @@ class GlobalVal(object):
     @classmethod
     def get_latest_chat_message(cls):
         """获取最新的普通消息"""
-        with cls._lock:
+        with cls._chat_lock:
             return cls.chat_messages[0] if cls.chat_messages else None
     
     @classmethod
     def get_latest_gift_message(cls):
         """获取最新的礼物消息"""
-        with cls._lock:
+        with cls._gift_lock:
             return cls.gift_messages[0] if cls.gift_messages else None
     
     @classmethod
     def get_latest_like_message(cls):
         """获取最新的点赞消息"""
-        with cls._lock:
+        with cls._like_lock:
             return cls.like_messages[0] if cls.like_messages else None
     
     @classmethod
     def get_latest_member_message(cls):
         """获取最新的成员进入消息"""
-        with cls._lock:
+        with cls._member_lock:
             return cls.member_messages[0] if cls.member_messages else None
     
     @classmethod
     def get_latest_messages(cls):
         """获取所有最新消息"""
-        with cls._lock:
-            return {
-                'chat': cls.chat_messages[0] if cls.chat_messages else None,
-                'gift': cls.gift_messages[0] if cls.gift_messages else None,
-                'like': cls.like_messages[0] if cls.like_messages else None,
-                'member': cls.member_messages[0] if cls.member_messages else None
-            }
+        # 逐个队列在各自的锁下读取，不再为一次快照锁住所有队列
+        chat_message = cls.get_latest_chat_message()
+        return {
+            'chat': chat_message._asdict() if chat_message else None,
+            'gift': cls.get_latest_gift_message(),
+            'like': cls.get_latest_like_message(),
+            'member': cls.get_latest_member_message()
+        }
     
     @classmethod
     def get_tts_throttle_info(cls):
         """获取TTS节流信息"""
         current_time = time.time()
-        with cls._lock:
+        with cls._chat_lock:
             time_since_last = current_time - cls._last_tts_time
             return {
                 'throttle_interval': cls._tts_throttle_interval,